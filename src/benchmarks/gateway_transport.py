@@ -0,0 +1,56 @@
+"""Compare a create-user + add-to-cart round trip through nginx and in memory.
+
+The nginx path needs `docker compose up` running; it is skipped otherwise.
+
+    python src/benchmarks/gateway_transport.py
+"""
+import os
+import sys
+import time
+
+import requests
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gateway import in_process_session
+
+console = Console()
+
+BASE_URL = "http://localhost:8080"
+ITERATIONS = 500
+
+
+def tool_chain(session: requests.Session):
+    """The calls a typical instruction makes"""
+    user = session.post(f"{BASE_URL}/users/", json={"name": "bench", "email": "bench@example.com"})
+    user.raise_for_status()
+    user_id = user.json()["id"]
+    session.post(f"{BASE_URL}/cart/", json={"user_id": user_id, "product_name": "book", "quantity": 1}).raise_for_status()
+    session.get(f"{BASE_URL}/users/{user_id}").raise_for_status()
+
+
+def measure(session: requests.Session) -> float:
+    """Return mean milliseconds per tool chain"""
+    tool_chain(session)  # warm up
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        tool_chain(session)
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+def main():
+    table = Table(title=f"Tool chain latency ({ITERATIONS} iterations, 3 calls each)")
+    table.add_column("Transport", style="bold")
+    table.add_column("ms / chain", style="green")
+
+    try:
+        table.add_row("nginx gateway", f"{measure(requests.Session()):.2f}")
+    except requests.exceptions.ConnectionError:
+        console.print(f"[yellow]nginx gateway not reachable at {BASE_URL}, skipping")
+    table.add_row("in-process ASGI", f"{measure(in_process_session(BASE_URL)):.2f}")
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
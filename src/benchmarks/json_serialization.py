@@ -0,0 +1,134 @@
+"""Micro-benchmark stdlib json against orjson on typical service payloads.
+
+Measures the raw encoders, then full requests to response_model routes
+shaped like the user and cart services, rendered with JSONResponse and
+ORJSONResponse (pydantic validation and jsonable_encoder included).
+
+    python src/benchmarks/json_serialization.py
+"""
+import json
+import timeit
+from typing import List, Optional
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from rich.console import Console
+from rich.table import Table
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+console = Console()
+
+NUMBER = 20000
+REQUESTS = 2000
+
+PAYLOADS = {
+    "user": {"id": 1, "name": "Jane Doe", "email": "jane@example.com"},
+    "cart item": {"id": 7, "user_id": 1, "product_name": "Mechanical keyboard", "quantity": 2},
+    "user cart (50 items)": [
+        {"id": i, "user_id": 1, "product_name": f"Product {i}", "quantity": i % 5 + 1} for i in range(50)
+    ],
+    "api log (200 calls)": [
+        {"method": "POST", "url": "http://localhost:8080/cart/", "params": None,
+         "request_body": {"user_id": i, "product_name": "Book", "quantity": 1}}
+        for i in range(200)
+    ],
+}
+
+
+# Same models as the user and cart services
+class User(BaseModel):
+    id: Optional[int] = None
+    name: str
+    email: str
+
+
+class CartItem(BaseModel):
+    id: Optional[int] = None
+    user_id: int
+    product_name: str
+    quantity: int
+
+
+def service_client(response_class) -> TestClient:
+    """App with the services' response_model routes, rendered by response_class"""
+    app = FastAPI(default_response_class=response_class)
+    user = PAYLOADS["user"]
+    cart_item = PAYLOADS["cart item"]
+    user_cart = PAYLOADS["user cart (50 items)"]
+
+    @app.get("/users/{user_id}", response_model=User)
+    async def get_user(user_id: int):
+        return user
+
+    @app.get("/cart/{item_id}", response_model=CartItem)
+    async def get_cart_item(item_id: int):
+        return cart_item
+
+    @app.get("/cart/user/{user_id}", response_model=List[CartItem])
+    async def get_user_cart(user_id: int):
+        return user_cart
+
+    return TestClient(app)
+
+
+SERVICE_ROUTES = {
+    "GET /users/{id} (User)": "/users/1",
+    "GET /cart/{id} (CartItem)": "/cart/7",
+    "GET /cart/user/{id} (50 CartItems)": "/cart/user/1",
+}
+
+
+def bench(func, number: int = NUMBER) -> float:
+    """Return microseconds per call"""
+    return timeit.timeit(func, number=number) / number * 1e6
+
+
+def main():
+    if orjson is None:
+        console.print("[yellow]orjson is not installed, only stdlib json is measured")
+
+    table = Table(title=f"JSON serialization (µs per call, {NUMBER} calls)")
+    table.add_column("Payload", style="bold")
+    table.add_column("json.dumps", style="cyan")
+    table.add_column("orjson.dumps", style="green")
+    table.add_column("json.loads", style="cyan")
+    table.add_column("orjson.loads", style="green")
+
+    for name, payload in PAYLOADS.items():
+        encoded = json.dumps(payload)
+        row = [name, f"{bench(lambda: json.dumps(payload)):.2f}"]
+        row.append(f"{bench(lambda: orjson.dumps(payload)):.2f}" if orjson else "-")
+        row.append(f"{bench(lambda: json.loads(encoded)):.2f}")
+        row.append(f"{bench(lambda: orjson.loads(encoded)):.2f}" if orjson else "-")
+        table.add_row(*row)
+
+    console.print(table)
+
+    clients = {"JSONResponse": service_client(JSONResponse)}
+    if orjson is not None:
+        from fastapi.responses import ORJSONResponse
+        clients["ORJSONResponse"] = service_client(ORJSONResponse)
+
+    table = Table(title=f"Service responses through response_model (µs per request, {REQUESTS} requests)")
+    table.add_column("Route", style="bold")
+    for name in clients:
+        table.add_column(name, style="green" if name == "ORJSONResponse" else "cyan")
+
+    for name, path in SERVICE_ROUTES.items():
+        row = [name]
+        for client in clients.values():
+            client.get(path).raise_for_status()  # warm up
+            row.append(f"{bench(lambda: client.get(path), REQUESTS):.1f}")
+        table.add_row(*row)
+
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Compare per-instruction overhead of the CLI and the orchestrator server.
+
+Both paths run the same instruction from a seeded plan cache against the
+in-process gateway, so no model call or network service is involved and
+the difference is process start-up, imports and spec loading.
+
+    python src/benchmarks/orchestrator_overhead.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+from rich.console import Console
+from rich.table import Table
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+from plan_cache import PlanCache
+
+console = Console()
+
+PORT = 9765
+ITERATIONS = 10
+INSTRUCTION = 'Create user "bench" with email bench@example.com and add 2 "book" to their cart'
+
+CLI_SCRIPT = """
+import sys
+sys.path.insert(0, {src!r})
+from microservice_api_openai_calling import APIConfig, APIOrchestrator
+config = APIConfig(debug=False, confirm_calls=False, in_process=True, plan_cache_file={plan_cache!r})
+APIOrchestrator(config).process_instruction({instruction!r})
+"""
+
+
+def seed_plan_cache(path: str):
+    user = {"name": "bench", "email": "bench@example.com"}
+    item = {"user_id": 1, "product_name": "book", "quantity": 2}
+    PlanCache(path).record(INSTRUCTION, [
+        ("create_user__post", {"requestBody": user}, {"id": 1, **user}),
+        ("create_cart_item__post", {"requestBody": item}, {"id": 1, **item}),
+    ])
+
+
+def measure_cli(env: dict, plan_cache: str) -> float:
+    script = CLI_SCRIPT.format(src=SRC_DIR, plan_cache=plan_cache, instruction=INSTRUCTION)
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        subprocess.run([sys.executable, "-c", script], env=env, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+def measure_server(env: dict) -> float:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "orchestrator_server:app", "--app-dir", SRC_DIR, "--port", str(PORT)],
+        env={**env, "ORCHESTRATOR_IN_PROCESS": "1"}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{PORT}/instructions?wait=true"
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                requests.post(url, json={"instruction": INSTRUCTION}).raise_for_status()  # warm up
+                break
+            except requests.exceptions.ConnectionError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.2)
+
+        session = requests.Session()
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            job = session.post(url, json={"instruction": INSTRUCTION}).json()
+            assert job["status"] == "done", job
+        return (time.perf_counter() - start) / ITERATIONS * 1000
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        plan_cache = os.path.join(tmp, "plan_cache.json")
+        seed_plan_cache(plan_cache)
+        # The OpenAI client is built but never called
+        env = {**os.environ, "ORCHESTRATOR_PLAN_CACHE": plan_cache}
+        env.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+        table = Table(title=f"Per-instruction overhead ({ITERATIONS} runs, cached plan)")
+        table.add_column("Mode", style="bold")
+        table.add_column("ms / instruction", style="green")
+        table.add_row("CLI process", f"{measure_cli(env, plan_cache):.1f}")
+        table.add_row("orchestrator server", f"{measure_server(env):.1f}")
+        console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Exercise the rate controllers against a local fake upstream.
+
+Starts a fake server that plays both the OpenAI chat completions endpoint
+and the user service, rejecting a share of requests with 429 + Retry-After
+and adding latency, then runs instructions concurrently through
+APIOrchestrator, prints the throttle/retry counters and exits non-zero if
+the 429s were not retried, Retry-After was not honoured or an instruction
+did not finish.
+
+    python src/benchmarks/rate_control_fake_server.py
+"""
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+console = Console()
+
+PORT = 9876
+BASE_URL = f"http://127.0.0.1:{PORT}"
+REJECT_RATE = 0.3  # Share of requests answered with 429
+# Keep below max_retries so every call can eventually succeed
+MAX_CONSECUTIVE_REJECTS = 2
+RETRY_AFTER = "0.2"
+LATENCY = (0.01, 0.2)  # Seconds added to every accepted request
+# Requests already in flight when a 429 is sent may still arrive shortly after
+GRACE = 0.05
+INSTRUCTIONS = 20
+CONCURRENCY = 8
+
+fake = FastAPI()
+counters = {"requests": 0, "rejected": 0, "early": 0}
+consecutive_rejects = {}  # path -> 429s sent in a row
+retry_windows = {}  # path -> (start, end) of the last Retry-After window
+
+
+async def inject_faults(path: str):
+    """Return a 429 response for a share of requests, otherwise add latency"""
+    counters["requests"] += 1
+    now = time.monotonic()
+    start, end = retry_windows.get(path, (0.0, 0.0))
+    if start <= now < end:
+        counters["early"] += 1
+    if consecutive_rejects.get(path, 0) < MAX_CONSECUTIVE_REJECTS and random.random() < REJECT_RATE:
+        consecutive_rejects[path] = consecutive_rejects.get(path, 0) + 1
+        counters["rejected"] += 1
+        retry_windows[path] = (now + GRACE, now + float(RETRY_AFTER) - GRACE)
+        return JSONResponse({"error": {"message": "Rate limit exceeded"}}, status_code=429, headers={"Retry-After": RETRY_AFTER})
+    consecutive_rejects[path] = 0
+    await asyncio.sleep(random.uniform(*LATENCY))
+    return None
+
+
+@fake.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    rejected = await inject_faults(request.url.path)
+    if rejected:
+        return rejected
+    body = await request.json()
+    message = {"role": "assistant", "content": "Created the user."}
+    if body["messages"][-1]["role"] != "tool":
+        message = {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:8]}",
+                "type": "function",
+                "function": {"name": "create_user__post", "arguments": '{"requestBody": {"name": "Fake", "email": "fake@example.com"}}'},
+            }],
+        }
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:8]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body["model"],
+        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 500, "completion_tokens": 20, "total_tokens": 520},
+    }
+
+
+@fake.post("/users/")
+async def create_user(request: Request):
+    rejected = await inject_faults(request.url.path)
+    if rejected:
+        return rejected
+    return {"id": random.randint(1, 1000), **(await request.json())}
+
+
+def start_fake_server() -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(fake, port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def main():
+    server = start_fake_server()
+    os.environ["OPENAI_BASE_URL"] = f"{BASE_URL}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+
+    from microservice_api_openai_calling import APIConfig, APIOrchestrator, console as orchestrator_console
+    orchestrator_console.quiet = True
+    config = APIConfig(
+        base_url=BASE_URL, debug=False, confirm_calls=False, plan_cache_file=None,
+        api_log_file=os.devnull, model_requests_per_minute=600,
+        # Concurrent calls share the reject streak above, so one call can still
+        # be rejected several times in a row; leave room for that
+        max_retries=8,
+    )
+    orchestrator = APIOrchestrator(config)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(CONCURRENCY) as pool:
+        results = list(pool.map(orchestrator.process_instruction, ["Create a user"] * INSTRUCTIONS))
+    elapsed = time.perf_counter() - start
+    server.should_exit = True
+
+    console.print(f"[cyan]{sum(r is not None for r in results)}/{INSTRUCTIONS} instructions completed in {elapsed:.1f}s")
+    console.print(
+        f"[cyan]Fake upstream: {counters['requests']} requests, {counters['rejected']} rejected with 429, "
+        f"{counters['early']} sent before Retry-After elapsed"
+    )
+
+    table = Table(title="Rate controller counters")
+    table.add_column("Counter", style="bold")
+    stats = orchestrator.rate_stats()
+    for name in stats:
+        table.add_column(name, style="green")
+    for key in stats["model"]:
+        table.add_row(key, *(f"{stats[name][key]:.2f}" if isinstance(stats[name][key], float) else str(stats[name][key]) for name in stats))
+    console.print(table)
+
+    problems = []
+    if any(r is None for r in results):
+        problems.append(f"{sum(r is None for r in results)} instructions did not finish")
+    if counters["rejected"] == 0:
+        problems.append("the fake upstream rejected no requests, nothing was tested")
+    if stats["model"]["retries"] == 0:
+        problems.append("no model call was retried")
+    for name in stats:
+        if stats[name]["failures"]:
+            problems.append(f"{stats[name]['failures']} {name} calls failed after retries")
+    if counters["early"]:
+        problems.append(f"{counters['early']} requests ignored Retry-After")
+    for problem in problems:
+        console.print(f"[red]FAIL: {problem}")
+    if problems:
+        sys.exit(1)
+    console.print("[green]OK: 429s were retried, Retry-After was honoured and every instruction finished")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Measure user_service throughput as uvicorn workers are added.
+
+Runs the service locally with the SQLite state backend for each worker count
+and hammers it with concurrent create/get requests.
+
+    python src/benchmarks/state_scaling.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+SERVICE_DIR = "./src/services/user_service/app"
+COMMON_DIR = os.path.abspath("./src/services/common")
+PORT = 8765
+WORKER_COUNTS = [1, 2, 4]
+CLIENT_THREADS = 32
+REQUESTS_PER_THREAD = 200
+
+
+def wait_until_ready(url: str, timeout: float = 15.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"Service did not start at {url}")
+
+
+def client_loop(base_url: str) -> int:
+    session = requests.Session()
+    done = 0
+    for i in range(REQUESTS_PER_THREAD):
+        if i % 2 == 0:
+            response = session.post(f"{base_url}/", json={"name": f"user{i}", "email": f"user{i}@example.com"})
+            user_id = response.json()["id"]
+        else:
+            response = session.get(f"{base_url}/{user_id}")
+        response.raise_for_status()
+        done += 1
+    return done
+
+
+def run(workers: int) -> float:
+    """Return requests per second for a given number of workers"""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "STATE_BACKEND": "sqlite", "STATE_DB_PATH": os.path.join(tmp, "state.db"), "PYTHONPATH": COMMON_DIR}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--workers", str(workers)],
+            cwd=SERVICE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        base_url = f"http://127.0.0.1:{PORT}"
+        try:
+            wait_until_ready(f"{base_url}/")
+            start = time.perf_counter()
+            with ThreadPoolExecutor(CLIENT_THREADS) as pool:
+                total = sum(pool.map(client_loop, [base_url] * CLIENT_THREADS))
+            return total / (time.perf_counter() - start)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    table = Table(title="user_service scaling (SQLite backend)")
+    table.add_column("Workers", style="bold")
+    table.add_column("Requests/s", style="green")
+    for workers in WORKER_COUNTS:
+        rps = run(workers)
+        console.print(f"[cyan]{workers} worker(s): {rps:.0f} req/s")
+        table.add_row(str(workers), f"{rps:.0f}")
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
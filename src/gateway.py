@@ -0,0 +1,158 @@
+"""In-process API gateway.
+
+Mounts every service app under the same prefix nginx routes it on, so a
+single-node deployment can run without nginx:
+
+    uvicorn src.gateway:app --port 8080
+
+``ASGIAdapter`` lets a ``requests.Session`` dispatch straight into the
+gateway app in memory, without opening a socket.
+"""
+import asyncio
+import concurrent.futures
+import importlib.util
+import os
+import sys
+import threading
+from http import HTTPStatus
+from io import BytesIO
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+SERVICES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "services")
+# Modules shared by every service (storage.py), copied next to main.py in the images
+COMMON_DIR = os.path.join(SERVICES_DIR, "common")
+
+# Gateway prefix -> service app directory, mirrors config/nginx/nginx.conf
+SERVICES = {
+    "users": os.path.join(SERVICES_DIR, "user_service", "app"),
+    "cart": os.path.join(SERVICES_DIR, "cart_service", "app"),
+}
+
+
+def load_service_app(name: str, app_dir: str):
+    """Import a service's main.py under a unique module name and return its app"""
+    # Services are written to run from their own directory and share the
+    # module name main, so import it under a unique name
+    sys.path[:0] = [app_dir, COMMON_DIR]
+    shadowed = sys.modules.pop("main", None)
+    try:
+        spec = importlib.util.spec_from_file_location(f"{name}_service_main", os.path.join(app_dir, "main.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(app_dir)
+        sys.path.remove(COMMON_DIR)
+        if shadowed is not None:
+            sys.modules["main"] = shadowed
+    return module.app
+
+
+def create_gateway(services: dict = None) -> Starlette:
+    """Build one ASGI app with every service mounted under its prefix"""
+    services = services or SERVICES
+    routes = [Mount(f"/{name}", app=load_service_app(name, app_dir)) for name, app_dir in services.items()]
+    return Starlette(routes=routes)
+
+
+class ASGIAdapter(BaseAdapter):
+    """requests transport adapter that calls an ASGI app in memory"""
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+        # A single background loop serves all calls, so the adapter is thread-safe
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        future = asyncio.run_coroutine_threadsafe(self._call_app(request), self._loop)
+        try:
+            status, headers, body = future.result(timeout=timeout if isinstance(timeout, (int, float)) else None)
+        except concurrent.futures.TimeoutError as e:
+            future.cancel()
+            raise requests.exceptions.ReadTimeout(str(e), request=request)
+        except Exception as e:
+            raise requests.exceptions.ConnectionError(str(e), request=request)
+        return self._build_response(request, status, headers, body)
+
+    async def _call_app(self, request):
+        url = urlsplit(request.url)
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": request.method,
+            "scheme": url.scheme,
+            "path": url.path,
+            "raw_path": url.path.encode(),
+            "query_string": url.query.encode(),
+            "root_path": "",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in request.headers.items()],
+            "client": ("127.0.0.1", 0),
+            "server": (url.hostname, url.port or 80),
+        }
+        response = {"status": 500, "headers": [], "body": []}
+        body_sent = asyncio.Event()
+
+        async def receive():
+            # The whole body arrives in one message; after that the client is
+            # gone, which also ends Starlette's listen_for_disconnect
+            if not body_sent.is_set():
+                body_sent.set()
+                return {"type": "http.request", "body": body, "more_body": False}
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["started"] = True
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        try:
+            await self.app(scope, receive, send)
+        except Exception:
+            # Starlette re-raises after sending its 500 response; only a
+            # failure before any response counts as a transport error
+            if "started" not in response:
+                raise
+        return response["status"], response["headers"], b"".join(response["body"])
+
+    @staticmethod
+    def _build_response(request, status, headers, body) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict({k.decode(): v.decode() for k, v in headers})
+        response.raw = BytesIO(body)
+        response._content = body
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        try:
+            response.reason = HTTPStatus(status).phrase
+        except ValueError:
+            response.reason = ""
+        return response
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+app = create_gateway()
+
+
+def in_process_session(base_url: str, gateway_app=None) -> requests.Session:
+    """Session whose requests to base_url are served by the gateway in memory"""
+    session = requests.Session()
+    session.mount(base_url.rstrip("/") + "/", ASGIAdapter(gateway_app or app))
+    return session
@@ -0,0 +1,48 @@
+"""JSON encoding/decoding using orjson when it is installed, stdlib json otherwise."""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson.JSONDecodeError subclasses this, so callers can catch one type
+JSONDecodeError = json.JSONDecodeError
+
+
+def dumps(obj, pretty: bool = False) -> str:
+    """Serialize obj to a JSON string, indented when pretty is set"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0).decode()
+        except TypeError:
+            # e.g. non-str dict keys or ints over 64 bits, which stdlib json accepts
+            pass
+    if pretty:
+        return json.dumps(obj, indent=2)
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def dumps_bytes(obj) -> bytes:
+    """Serialize obj to UTF-8 encoded JSON, e.g. for HTTP request bodies"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(data):
+    """Deserialize a JSON str or bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump(obj, f, pretty: bool = False):
+    f.write(dumps(obj, pretty=pretty))
+
+
+def load(f):
+    return loads(f.read())
@@ -1,13 +1,20 @@
 import os
 import json
 import jsonref
+import json_backend
+import openai
 import requests
-from typing import Dict, List, Optional
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from typing import Callable, Dict, List, Optional
 from dataclasses import dataclass
 from pprint import pp
 from openai import OpenAI
 from rich.console import Console
 from rich.prompt import Confirm
+from plan_cache import PlanCache, PlanMismatch
+from rate_control import RateController, Throttled, parse_retry_after
 
 console = Console()
 
@@ -20,6 +27,18 @@ class APIConfig:
     api_names: List[str] = None
     debug: bool = True
     api_log_file: str = "api_log.json"
+    in_process: bool = False  # Dispatch to the services in memory via gateway.py instead of nginx
+    plan_cache_file: Optional[str] = "plan_cache.json"  # None disables replaying learned plans
+    confirm_calls: bool = True  # Ask before each API call, disabled in server mode
+    http_pool_size: int = 10  # Connections kept per service host
+    service_timeout: float = 30.0
+    # Shared rate/concurrency limits, see rate_control.py
+    model_requests_per_minute: float = 500
+    model_tokens_per_minute: Optional[float] = 200_000
+    model_max_concurrency: int = 8
+    service_requests_per_second: float = 100
+    service_max_concurrency: int = 32
+    max_retries: int = 4
 
     def __post_init__(self):
         if self.api_names is None:
@@ -28,14 +47,112 @@ class APIConfig:
 class APIOrchestrator:
     def __init__(self, config: APIConfig):
         self.config = config
-        self.client = OpenAI()
+        # Retries are handled by model_limiter
+        self.client = OpenAI(max_retries=0)
+        self.model_limiter = RateController(
+            "model",
+            requests_per_second=config.model_requests_per_minute / 60,
+            tokens_per_second=config.model_tokens_per_minute / 60 if config.model_tokens_per_minute else None,
+            max_concurrency=config.model_max_concurrency,
+            target_latency=30.0,
+            max_retries=config.max_retries,
+        )
+        self.service_limiter = RateController(
+            "services",
+            requests_per_second=config.service_requests_per_second,
+            max_concurrency=config.service_max_concurrency,
+            target_latency=1.0,
+            max_retries=config.max_retries,
+        )
         self.console = Console()
+        self.http = self._create_http_session()
         self.openapi_specs = self._load_all_specs()
         self.functions = self._convert_specs_to_functions()
+        self.operations = self._index_operations()
+        self._function_tokens = len(json_backend.dumps(self.functions)) // 4
+        self._log_lock = threading.Lock()
+        self.plan_cache = PlanCache(self.config.plan_cache_file) if self.config.plan_cache_file else None
         
         if self.config.debug:
             self._debug_print_functions()
     
+    def _create_http_session(self) -> requests.Session:
+        """Create the session used for service calls"""
+        if self.config.in_process:
+            from gateway import in_process_session
+            return in_process_session(self.config.base_url)
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.config.http_pool_size, pool_maxsize=self.config.http_pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def rate_stats(self) -> Dict:
+        """Throttle, retry and latency counters of the shared rate controllers"""
+        return {"model": self.model_limiter.stats(), "services": self.service_limiter.stats()}
+
+    def _create_chat_completion(self, messages: List[Dict]):
+        """Call the model under model_limiter, retrying rate limits, timeouts and server errors"""
+        # Rough estimate of 4 characters per token, corrected from the reported usage
+        estimated_tokens = len(str(messages)) // 4 + self._function_tokens
+
+        def request():
+            try:
+                return self.client.chat.completions.create(
+                    model="gpt-3.5-turbo-16k",
+                    tools=self.functions,
+                    tool_choice="auto",
+                    temperature=0,
+                    messages=messages
+                )
+            except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError) as e:
+                response = getattr(e, "response", None)
+                retry_after = parse_retry_after(response.headers.get("retry-after")) if response is not None else None
+                raise Throttled(f"Model call failed: {str(e)}", retry_after) from e
+
+        response = self.model_limiter.call(request, cost=estimated_tokens)
+        if getattr(response, "usage", None) is not None:
+            self.model_limiter.adjust_tokens(response.usage.total_tokens - estimated_tokens)
+        return response
+
+    @staticmethod
+    def _connection_not_established(error: requests.exceptions.ConnectionError) -> bool:
+        """Whether a connection error happened before the request could be sent"""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        reason = error.args[0] if error.args else None
+        if isinstance(reason, MaxRetryError):
+            reason = reason.reason
+        return isinstance(reason, NewConnectionError)
+
+    def _send_request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Call a service under service_limiter, retrying throttling and transient failures"""
+        idempotent = method.upper() in ("GET", "HEAD", "PUT", "DELETE")
+
+        def request():
+            try:
+                response = self.http.request(method=method, url=url, timeout=self.config.service_timeout, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                # A connection that was aborted after the request went out may
+                # have been acted on, so only retry non-idempotent requests
+                # that never reached the service
+                if not idempotent and not self._connection_not_established(e):
+                    raise
+                raise Throttled(f"Connection failed: {str(e)}") from e
+            except requests.exceptions.Timeout as e:
+                # The service may have acted on a non-idempotent request already
+                if not idempotent:
+                    raise
+                raise Throttled(f"Request timed out: {str(e)}") from e
+            if response.status_code in (429, 503) or (idempotent and response.status_code in (502, 504)):
+                raise Throttled(
+                    f"{response.status_code} {response.reason} for url: {url}",
+                    parse_retry_after(response.headers.get("Retry-After")),
+                )
+            return response
+
+        return self.service_limiter.call(request)
+
     def _debug_print_functions(self):
         """Print available functions for debugging"""
         console.rule("[yellow]Available API Functions")
@@ -106,6 +223,17 @@ class APIOrchestrator:
                     functions.append(function_def)
                     
         return functions
+    def _index_operations(self) -> Dict[str, tuple]:
+        """Map function names to their (api_name, path, method) once, for execute_api_call"""
+        operations = {}
+        for api_name, spec in self.openapi_specs.items():
+            for path, methods in spec["paths"].items():
+                for method, details in methods.items():
+                    function_name = details.get("operationId") or f"{method}_{path.replace('/', '_')}"
+                    # Keep the first match, as the linear search over the specs did
+                    operations.setdefault(function_name, (api_name, path, method))
+        return operations
+
     def _build_parameters_schema(self, spec: Dict) -> Dict:
         """Build OpenAI function parameters schema from OpenAPI spec"""
         schema = {"type": "object", "properties": {}}
@@ -143,8 +271,71 @@ class APIOrchestrator:
         # Prepend API name to ensure correct routing
         return f"{base_path}/{api_name}{endpoint_path}"
         
-    def process_instruction(self, instruction: str) -> None:
-        """Process user instruction and execute necessary API calls"""
+    def _run_cached_plan(self, instruction: str, on_event: Callable[[Dict], None]) -> tuple:
+        """Replay a learned plan for the instruction.
+
+        Returns (summary, calls): summary is None if the model is needed, and
+        calls are the (function_name, args, response) calls already made.
+        """
+        cached = self.plan_cache.lookup(instruction)
+        if cached is None:
+            return None, []
+
+        plan, slots = cached
+        console.print(f"[cyan]Running cached plan ({len(plan['steps'])} calls) for: {plan['template']}")
+
+        def execute(function_name: str, args: Dict) -> Dict:
+            api_response = self.execute_api_call(function_name, args)
+            on_event({"type": "api_call", "function": function_name, "arguments": args, "response": api_response})
+            return api_response
+
+        try:
+            results = self.plan_cache.run(plan, slots, execute)
+        except PlanMismatch as e:
+            console.print(f"[yellow]Cached plan did not apply ({str(e)}), falling back to the model")
+            self.plan_cache.invalidate(instruction)
+            return None, e.calls
+
+        summary = "\n".join(f"{function_name}: {json_backend.dumps(api_response)}" for function_name, api_response in results)
+        console.print("\nFinal Result (cached plan):", style="bold green")
+        console.print(summary)
+        return summary, []
+
+    def _tool_call_messages(self, calls: List[tuple]) -> List[Dict]:
+        """Assistant and tool messages describing calls made without the model"""
+        tool_calls = [
+            {
+                "id": f"cached_plan_{i}",
+                "type": "function",
+                "function": {"name": function_name, "arguments": json_backend.dumps(args)},
+            }
+            for i, (function_name, args, _) in enumerate(calls)
+        ]
+        messages = [{"role": "assistant", "tool_calls": tool_calls}]
+        for tool_call, (function_name, _, api_response) in zip(tool_calls, calls):
+            messages.append({
+                "role": "tool",
+                "name": function_name,
+                "tool_call_id": tool_call["id"],
+                "content": json_backend.dumps(api_response)
+            })
+        return messages
+
+    def process_instruction(self, instruction: str, on_event: Optional[Callable[[Dict], None]] = None) -> Optional[str]:
+        """Process user instruction and execute necessary API calls.
+
+        Returns the final assistant message, or None if the run did not finish.
+        on_event is called with a dict for every API call, the final message and errors.
+        """
+        on_event = on_event or (lambda event: None)
+
+        plan_calls = []
+        if self.plan_cache is not None:
+            result, plan_calls = self._run_cached_plan(instruction, on_event)
+            if result is not None:
+                on_event({"type": "final", "content": result, "cached_plan": True})
+                return result
+
         messages = [
             {
                 "role": "system",
@@ -155,23 +346,30 @@ class APIOrchestrator:
             },
             {"role": "user", "content": instruction}
         ]
+        # Calls a failed cached plan already made are handed to the model, so it
+        # continues from them instead of repeating their side effects
+        if plan_calls:
+            messages.extend(self._tool_call_messages(plan_calls))
         
+        # (function_name, args, response) for the plan cache
+        calls = [call for call in plan_calls if not (isinstance(call[2], dict) and "error" in call[2])]
+        result = None
         num_calls = 0
         while num_calls < self.config.max_calls:
             try:
-                response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo-16k",
-                    tools=self.functions,
-                    tool_choice="auto",
-                    temperature=0,
-                    messages=messages
-                )
+                response = self._create_chat_completion(messages)
                 
                 message = response.choices[0].message
                 
                 if not message.tool_calls:
                     console.print("\nFinal Assistant Message:", style="bold green")
                     console.print(message.content)
+                    result = message.content
+                    on_event({"type": "final", "content": result, "cached_plan": False})
+                    if self.plan_cache is not None and calls and not any(
+                        isinstance(r, dict) and "error" in r for _, _, r in calls
+                    ):
+                        self.plan_cache.record(instruction, calls)
                     break
                     
                 messages.append({
@@ -181,25 +379,31 @@ class APIOrchestrator:
                 
                 for tool_call in message.tool_calls:
                     function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
+                    function_args = json_backend.loads(tool_call.function.arguments)
                     
                     api_response = self.execute_api_call(function_name, function_args)
+                    calls.append((function_name, function_args, api_response))
+                    on_event({"type": "api_call", "function": function_name, "arguments": function_args, "response": api_response})
                     
                     messages.append({
                         "role": "tool",
                         "name": tool_call.function.name,
                         "tool_call_id": tool_call.id,
-                        "content": json.dumps(api_response)
+                        "content": json_backend.dumps(api_response)
                     })
                     
                 num_calls += 1
                 
             except Exception as e:
                 console.print(f"[red]Error processing instruction: {str(e)}")
+                on_event({"type": "error", "message": str(e)})
                 break
                 
         if num_calls >= self.config.max_calls:
             console.print(f"[yellow]Reached maximum number of API calls: {self.config.max_calls}")
+            on_event({"type": "error", "message": f"Reached maximum number of API calls: {self.config.max_calls}"})
+
+        return result
 
 
     def _log_api_call(self, method, url, params, request_body):
@@ -213,67 +417,70 @@ class APIOrchestrator:
 
         log_file = self.config.api_log_file
         try:
-            if os.path.exists(log_file):
-                with open(log_file, "r") as f:
-                    logs = json.load(f)
-            else:
-                logs = []
+            # Concurrent instructions share the log file
+            with self._log_lock:
+                if os.path.exists(log_file):
+                    with open(log_file, "r") as f:
+                        logs = json_backend.load(f)
+                else:
+                    logs = []
 
-            logs.append(log_entry)
+                logs.append(log_entry)
 
-            with open(log_file, "w") as f:
-                json.dump(logs, f, indent=4)
+                with open(log_file, "w") as f:
+                    json_backend.dump(logs, f, pretty=True)
 
         except Exception as e:
             console.print(f"[red]Failed to log API call: {str(e)}")
 
     def execute_api_call(self, function_name: str, params: Dict) -> Dict:
         """Execute and log API call"""
-        for api_name, spec in self.openapi_specs.items():
-            for path, methods in spec["paths"].items():
-                for method, details in methods.items():
-                    current_func_name = details.get("operationId") or f"{method}_{path.replace('/', '_')}"
-
-                    if current_func_name == function_name:
-                        full_path = f"{self.config.base_url}/{api_name}{path}"
-
-                        if "parameters" in params:
-                            try:
-                                full_path = full_path.format(**params["parameters"])
-                                console.print(f"\n[yellow]API Request:[/yellow] {method.upper()} {full_path}")
-                            except KeyError as e:
-                                console.print(f"[red]Missing path parameter: {e}")
-                                return {"error": f"Missing path parameter: {e}"}
-
-                        if "parameters" not in params:
-                            console.print(f"\n[yellow]API Request:[/yellow] {method.upper()} {full_path}")
-                        if "requestBody" in params:
-                            console.print(f"[yellow]Request Body:[/yellow] {json.dumps(params['requestBody'], indent=4)}")
-
-                        confirm = Confirm.ask("[yellow]Proceed with API call?[/yellow]", default=True)
-                        if not confirm:
-                            console.print("[red]API call canceled by user.[/red]")
-                            return {"error": "API call canceled by user"}
-
-                        try:
-                            response = requests.request(
-                                method=method.upper(),
-                                url=full_path,
-                                json=params.get("requestBody"),
-                                params=params.get("parameters") if method.lower() == "get" else None,
-                                headers={"Content-Type": "application/json"}
-                            )
-                            response.raise_for_status()
-
-                            self._log_api_call(method, full_path, params.get("parameters"), params.get("requestBody"))
-
-                            return response.json()
-
-                        except requests.exceptions.RequestException as e:
-                            console.print(f"[red]API call failed: {str(e)}")
-                            return {"error": f"API call failed: {str(e)}"}
-
-        return {"error": f"Function '{function_name}' not found in OpenAPI specs"}
+        operation = self.operations.get(function_name)
+        if operation is None:
+            return {"error": f"Function '{function_name}' not found in OpenAPI specs"}
+
+        api_name, path, method = operation
+        full_path = f"{self.config.base_url}/{api_name}{path}"
+
+        if "parameters" in params:
+            try:
+                full_path = full_path.format(**params["parameters"])
+                console.print(f"\n[yellow]API Request:[/yellow] {method.upper()} {full_path}")
+            except KeyError as e:
+                console.print(f"[red]Missing path parameter: {e}")
+                return {"error": f"Missing path parameter: {e}"}
+
+        if "parameters" not in params:
+            console.print(f"\n[yellow]API Request:[/yellow] {method.upper()} {full_path}")
+        if "requestBody" in params:
+            console.print(f"[yellow]Request Body:[/yellow] {json_backend.dumps(params['requestBody'], pretty=True)}")
+
+        if self.config.confirm_calls:
+            confirm = Confirm.ask("[yellow]Proceed with API call?[/yellow]", default=True)
+            if not confirm:
+                console.print("[red]API call canceled by user.[/red]")
+                return {"error": "API call canceled by user"}
+
+        try:
+            response = self._send_request(
+                method.upper(),
+                full_path,
+                data=json_backend.dumps_bytes(params["requestBody"]) if "requestBody" in params else None,
+                params=params.get("parameters") if method.lower() == "get" else None,
+                headers={"Content-Type": "application/json"}
+            )
+            response.raise_for_status()
+
+            self._log_api_call(method, full_path, params.get("parameters"), params.get("requestBody"))
+
+            return json_backend.loads(response.content)
+
+        except (requests.exceptions.RequestException, Throttled) as e:
+            console.print(f"[red]API call failed: {str(e)}")
+            return {"error": f"API call failed: {str(e)}"}
+        except json_backend.JSONDecodeError as e:
+            console.print(f"[red]Invalid JSON response: {str(e)}")
+            return {"error": f"Invalid JSON response: {str(e)}"}
 
 def main():
     config = APIConfig(debug=False)
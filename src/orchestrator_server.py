@@ -0,0 +1,146 @@
+"""HTTP server mode for APIOrchestrator.
+
+Keeps a single orchestrator (loaded specs, HTTP connection pools and the
+OpenAI client) warm and runs instructions concurrently on a thread pool:
+
+    uvicorn orchestrator_server:app --app-dir src --port 9000
+
+Endpoints:
+- POST /instructions                  submit an instruction (?wait=true blocks until it finishes)
+- GET  /instructions/{job_id}         status, progress events and result
+- GET  /instructions/{job_id}/events  progress as server-sent events
+- GET  /stats                         throttle, retry and latency counters
+"""
+import asyncio
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+import json_backend
+from microservice_api_openai_calling import APIConfig, APIOrchestrator
+
+MAX_WORKERS = int(os.getenv("ORCHESTRATOR_WORKERS", "8"))
+MAX_JOBS = 1000  # Jobs kept for GET /instructions/{job_id}; only finished ones are evicted
+
+app = FastAPI(title="API Orchestrator")
+
+
+class InstructionRequest(BaseModel):
+    instruction: str
+
+
+@dataclass
+class Job:
+    id: str
+    instruction: str
+    status: str = "pending"  # pending, running, done, failed
+    events: List[Dict] = field(default_factory=list)
+    result: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "instruction": self.instruction,
+            "status": self.status,
+            "events": self.events,
+            "result": self.result,
+        }
+
+
+jobs: "OrderedDict[str, Job]" = OrderedDict()
+orchestrator: Optional[APIOrchestrator] = None
+executor: Optional[ThreadPoolExecutor] = None
+
+
+@app.on_event("startup")
+def start_orchestrator():
+    global orchestrator, executor
+    config = APIConfig(
+        debug=False,
+        confirm_calls=False,
+        in_process=os.getenv("ORCHESTRATOR_IN_PROCESS") == "1",
+        http_pool_size=MAX_WORKERS,
+        plan_cache_file=os.getenv("ORCHESTRATOR_PLAN_CACHE", "plan_cache.json"),
+    )
+    orchestrator = APIOrchestrator(config)
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="instruction")
+
+
+@app.on_event("shutdown")
+def stop_orchestrator():
+    executor.shutdown(wait=False)
+
+
+def run_job(job: Job):
+    job.status = "running"
+    try:
+        job.result = orchestrator.process_instruction(job.instruction, on_event=job.events.append)
+        job.status = "done" if job.result is not None else "failed"
+    except Exception as e:
+        job.events.append({"type": "error", "message": str(e)})
+        job.status = "failed"
+
+
+def evict_finished_jobs():
+    """Drop the oldest finished jobs beyond MAX_JOBS; pending and running jobs are kept"""
+    excess = len(jobs) - MAX_JOBS
+    if excess <= 0:
+        return
+    finished = [job_id for job_id, job in jobs.items() if job.status in ("done", "failed")]
+    for job_id in finished[:excess]:
+        del jobs[job_id]
+
+
+def get_job(job_id: str) -> Job:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Instruction not found")
+    return job
+
+
+@app.post("/instructions")
+async def submit_instruction(request: InstructionRequest, wait: bool = False):
+    job = Job(id=uuid.uuid4().hex, instruction=request.instruction)
+    jobs[job.id] = job
+    evict_finished_jobs()
+
+    future = executor.submit(run_job, job)
+    if wait:
+        await asyncio.wrap_future(future)
+    return job.to_dict()
+
+
+@app.get("/instructions/{job_id}")
+async def get_instruction(job_id: str):
+    return get_job(job_id).to_dict()
+
+
+@app.get("/instructions/{job_id}/events")
+async def stream_instruction(job_id: str):
+    job = get_job(job_id)
+
+    async def event_stream():
+        sent = 0
+        while True:
+            finished = job.status in ("done", "failed")
+            while sent < len(job.events):
+                yield f"data: {json_backend.dumps(job.events[sent])}\n\n"
+                sent += 1
+            if finished:
+                yield f"event: end\ndata: {json_backend.dumps({'status': job.status})}\n\n"
+                break
+            await asyncio.sleep(0.05)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def get_stats():
+    return orchestrator.rate_stats()
@@ -0,0 +1,233 @@
+"""Cache of tool-call plans learned from successful orchestrator runs.
+
+An instruction is normalized into a template by replacing its literal values
+(quoted strings, emails and numbers) with placeholders. When a run succeeds,
+the sequence of API calls is compiled into a plan where each argument is
+either one of those instruction values, a field from an earlier call's
+response (e.g. the ``id`` from ``create_user`` feeding ``user_id``), or a
+constant. Later instructions with the same template replay the plan without
+the model.
+"""
+import os
+import re
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from rich.console import Console
+
+import json_backend
+
+console = Console()
+
+SLOT_PATTERN = re.compile(
+    r'"[^"]*"'                       # double-quoted string
+    r"|'[^']*'"                      # single-quoted string
+    r"|[\w.+-]+@[\w-]+(?:\.[\w-]+)+"  # email
+    r"|\b\d+(?:\.\d+)?\b"            # number
+)
+
+
+class PlanMismatch(Exception):
+    """A cached plan does not apply to the current instruction or responses.
+
+    calls holds the (function_name, args, response) calls the plan had
+    already made, the last one being the failed call if it was sent.
+    """
+
+    def __init__(self, message: str, calls: Optional[List[Tuple[str, Dict, Dict]]] = None):
+        super().__init__(message)
+        self.calls = calls or []
+
+
+def normalize_instruction(instruction: str) -> Tuple[str, List[str]]:
+    """Split an instruction into a template and its literal values"""
+    slots = []
+
+    def replace(match):
+        slots.append(match.group(0).strip("\"'"))
+        return f"<{len(slots) - 1}>"
+
+    template = SLOT_PATTERN.sub(replace, instruction)
+    template = " ".join(template.lower().split())
+    return template, slots
+
+
+def _keys_compatible(arg_key: str, result_key: str) -> bool:
+    """Whether an argument could be fed from a response field, e.g. user_id <- id"""
+    return arg_key == result_key or arg_key.endswith(f"_{result_key}")
+
+
+def _flatten(value, path=()) -> List[Tuple[tuple, object]]:
+    """List (path, leaf) pairs of a JSON value"""
+    if isinstance(value, dict):
+        return [leaf for key, item in value.items() for leaf in _flatten(item, path + (key,))]
+    if isinstance(value, list):
+        return [leaf for i, item in enumerate(value) for leaf in _flatten(item, path + (i,))]
+    return [(path, value)]
+
+
+def _used_slots(value) -> set:
+    """Indexes of the instruction values a compiled argument binds"""
+    if isinstance(value, list):
+        return set().union(*map(_used_slots, value))
+    if not isinstance(value, dict):
+        return set()
+    if "$slots" in value:
+        return set(value["$slots"])
+    return set().union(*map(_used_slots, value.values()))
+
+
+def _resolve_path(value, path):
+    for key in path:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            raise PlanMismatch(f"Response has no field {'.'.join(map(str, path))}")
+    return value
+
+
+class PlanCache:
+    """Compiled plans keyed by instruction template, persisted to a JSON file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.plans: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.plans = json_backend.load(f)
+            except json_backend.JSONDecodeError as e:
+                console.print(f"[red]Error parsing JSON in '{path}', starting with an empty plan cache: {str(e)}[/red]")
+
+    def _save(self):
+        # Callers hold self._lock. Write a temporary file and swap it in, so an
+        # interrupted write never leaves a truncated cache behind
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json_backend.dump(self.plans, f, pretty=True)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def lookup(self, instruction: str) -> Optional[Tuple[Dict, List[str]]]:
+        """Return the plan and instruction values for an instruction, if cached"""
+        template, slots = normalize_instruction(instruction)
+        plan = self.plans.get(template)
+        if plan is None:
+            return None
+        return plan, slots
+
+    def invalidate(self, instruction: str):
+        template, _ = normalize_instruction(instruction)
+        with self._lock:
+            if self.plans.pop(template, None) is not None:
+                self._save()
+
+    def record(self, instruction: str, calls: List[Tuple[str, Dict, Dict]]) -> bool:
+        """Compile and store the (function_name, args, response) calls of a successful run.
+
+        Returns False, caching nothing, if some instruction value is not
+        bound by any argument: the value then shaped the plan in a way it
+        cannot replay, e.g. the number of calls in "Create 2 users".
+        """
+        template, slots = normalize_instruction(instruction)
+        steps = []
+        for function_name, args, _ in calls:
+            steps.append({
+                "function": function_name,
+                "args": self._compile_value(args, None, slots, calls[:len(steps)]),
+            })
+
+        unused = set(range(len(slots))) - _used_slots([step["args"] for step in steps])
+        if unused:
+            console.print(f"[yellow]Not caching plan, it does not use {sorted(slots[i] for i in unused)} from the instruction")
+            return False
+
+        with self._lock:
+            self.plans[template] = {"template": template, "steps": steps}
+            self._save()
+        return True
+
+    def _compile_value(self, value, key, slots, previous_calls):
+        """Replace a recorded argument with a slot, response reference or constant"""
+        if isinstance(value, dict):
+            return {k: self._compile_value(v, k, slots, previous_calls) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._compile_value(v, key, slots, previous_calls) for v in value]
+        if value is None or isinstance(value, bool):
+            return value
+
+        # Response field with the same value, preferring the same name, then a
+        # compatible name, then the most recent call
+        best, best_rank = None, 0
+        for step in reversed(range(len(previous_calls))):
+            response = previous_calls[step][2]
+            for path, leaf in _flatten(response):
+                if leaf != value or isinstance(leaf, bool) or not path:
+                    continue
+                result_key = next((p for p in reversed(path) if isinstance(p, str)), None)
+                if key and result_key == key:
+                    rank = 3
+                elif key and result_key and _keys_compatible(key, result_key):
+                    rank = 2
+                else:
+                    rank = 1 if isinstance(value, str) else 0
+                if rank > best_rank:
+                    best, best_rank = [step, *path], rank
+        # A same-named response field is data flow (user_id <- id) even if the
+        # value also happens to appear in the instruction
+        if best_rank >= 2:
+            return {"$ref": best}
+        # Keep every instruction value it could be; replay checks they agree
+        candidates = [i for i, slot in enumerate(slots) if slot == str(value)]
+        if candidates:
+            return {"$slots": candidates, "$type": type(value).__name__}
+        return {"$ref": best} if best else value
+
+    def run(self, plan: Dict, slots: List[str], execute: Callable[[str, Dict], Dict]) -> List[Tuple[str, Dict]]:
+        """Execute a plan, raising PlanMismatch if it does not fit or a call fails"""
+        responses = []
+        calls = []
+        try:
+            for step in plan["steps"]:
+                args = self._bind_value(step["args"], slots, responses)
+                response = execute(step["function"], args)
+                calls.append((step["function"], args, response))
+                if isinstance(response, dict) and "error" in response:
+                    raise PlanMismatch(f"{step['function']} failed: {response['error']}")
+                responses.append(response)
+        except PlanMismatch as e:
+            e.calls = calls
+            raise
+        return [(function_name, response) for function_name, _, response in calls]
+
+    def _bind_value(self, value, slots, responses):
+        if isinstance(value, list):
+            return [self._bind_value(v, slots, responses) for v in value]
+        if not isinstance(value, dict):
+            return value
+        if "$slots" in value:
+            indexes = value["$slots"]
+            if max(indexes) >= len(slots):
+                raise PlanMismatch(f"Instruction has no value #{max(indexes)}")
+            # The recorded value matched several instruction values; only
+            # replay if they still agree, otherwise the binding is ambiguous
+            candidates = {slots[i] for i in indexes}
+            if len(candidates) > 1:
+                raise PlanMismatch(f"Ambiguous value, could be any of {sorted(candidates)}")
+            slot = candidates.pop()
+            caster = {"int": int, "float": float}.get(value["$type"], str)
+            try:
+                return caster(slot)
+            except ValueError:
+                raise PlanMismatch(f"Value {slot!r} is not a {value['$type']}")
+        if "$ref" in value:
+            step, *path = value["$ref"]
+            if step >= len(responses):
+                raise PlanMismatch(f"Plan references step {step} before it ran")
+            return _resolve_path(responses[step], path)
+        return {k: self._bind_value(v, slots, responses) for k, v in value.items()}
@@ -0,0 +1,215 @@
+"""Shared rate, concurrency and retry control for model and service calls.
+
+A ``RateController`` combines:
+- token buckets for the request rate and, optionally, a token budget,
+- an adaptive concurrency limit that shrinks when calls are throttled or
+  slower than a target latency and grows back slowly otherwise (AIMD),
+- retries with jittered exponential backoff that honour Retry-After.
+
+Call wrappers raise ``Throttled`` to ask for a retry.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+
+class Throttled(Exception):
+    """A call was rejected or timed out and may be retried"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delay-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at rate tokens per second"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Block until amount tokens are available, returns the seconds waited"""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = max(self.blocked_until - now, (amount - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def wait_unblocked(self) -> float:
+        """Block while a pause is in effect, returns the seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                delay = self.blocked_until - time.monotonic()
+            if delay <= 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """Hold every caller back for seconds, e.g. after a Retry-After"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def adjust(self, delta: float):
+        """Charge (or refund, if negative) tokens once the real cost is known"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class AdaptiveConcurrencyLimit:
+    """Concurrency limit adjusted by additive increase, multiplicative decrease"""
+
+    def __init__(self, maximum: int, target_latency: float, minimum: int = 1, backoff_ratio: float = 0.7):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.target_latency = target_latency
+        self.backoff_ratio = backoff_ratio
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, throttled: bool):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled or latency > self.target_latency:
+                self.limit = max(self.minimum, self.limit * self.backoff_ratio)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class RateController:
+    """Rate limits, adapts concurrency and retries calls to one upstream"""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_second: float,
+        tokens_per_second: Optional[float] = None,
+        max_concurrency: int = 8,
+        target_latency: float = 5.0,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ):
+        self.name = name
+        self.requests = TokenBucket(requests_per_second)
+        # Allow a minute's budget in one burst, matching per-minute quotas
+        self.tokens = TokenBucket(tokens_per_second, tokens_per_second * 60) if tokens_per_second else None
+        self.concurrency = AdaptiveConcurrencyLimit(max_concurrency, target_latency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "throttled": 0,
+            "retries": 0,
+            "failures": 0,
+            "wait_seconds": 0.0,
+            "latency_seconds": 0.0,
+        }
+
+    def _count(self, key: str, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def call(self, func: Callable, cost: float = 0.0):
+        """Run func under the limits, retrying while it raises Throttled.
+
+        cost is the estimated number of budget tokens the call uses.
+        """
+        for attempt in range(self.max_retries + 1):
+            waited = self.requests.acquire()
+            charged = 0.0
+            if self.tokens is not None and cost:
+                waited += self.tokens.acquire(cost)
+                charged = min(cost, self.tokens.capacity)
+
+            self.concurrency.acquire()
+            # A Retry-After may have arrived while waiting for a slot
+            waited += self.requests.wait_unblocked()
+            self._count("wait_seconds", waited)
+            self._count("calls")
+            start = time.monotonic()
+            throttled = False
+            try:
+                return func()
+            except Throttled as e:
+                throttled = True
+                error = e
+                self._count("throttled")
+                # A rejected attempt did not use its budget; the next attempt
+                # charges it again
+                if charged:
+                    self.tokens.adjust(-charged)
+                if e.retry_after:
+                    self.requests.pause(e.retry_after)
+            finally:
+                latency = time.monotonic() - start
+                self._count("latency_seconds", latency)
+                self.concurrency.release(latency, throttled)
+
+            if attempt < self.max_retries:
+                self._count("retries")
+                time.sleep(self._backoff(attempt, error.retry_after))
+
+        self._count("failures")
+        raise error
+
+    def adjust_tokens(self, delta: float):
+        """Correct the token budget by actual minus estimated usage"""
+        if self.tokens is not None:
+            self.tokens.adjust(delta)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["concurrency_limit"] = round(self.concurrency.limit, 2)
+        stats["in_flight"] = self.concurrency.in_flight
+        return stats
@@ -1,4 +1,4 @@
-import json
+import json_backend
 from time import sleep
 import requests
 from rich.console import Console
@@ -12,11 +12,11 @@ def load_api_log():
     """Load API call log from JSON file."""
     try:
         with open(API_LOG_FILE, "r") as f:
-            return json.load(f)
+            return json_backend.load(f)
     except FileNotFoundError:
         console.print(f"[red]Error: Log file '{API_LOG_FILE}' not found.[/red]")
         return []
-    except json.JSONDecodeError as e:
+    except json_backend.JSONDecodeError as e:
         console.print(f"[red]Error parsing JSON in '{API_LOG_FILE}': {str(e)}[/red]")
         return []
 
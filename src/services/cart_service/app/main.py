@@ -4,8 +4,16 @@ from pydantic import BaseModel
 from typing import Optional, List
 import uvicorn
 
+from storage import get_backend
+
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    from fastapi.responses import JSONResponse as DefaultResponse
+
 # Add prefix to match the nginx routing
-app = FastAPI(root_path="/cart")
+app = FastAPI(root_path="/cart", default_response_class=DefaultResponse)
 
 class CartItem(BaseModel):
     id: Optional[int] = None
@@ -13,32 +21,28 @@ class CartItem(BaseModel):
     product_name: str
     quantity: int
 
-carts_db = []
+# Shared across workers/replicas when STATE_BACKEND is not "memory"
+carts_db = get_backend("carts", index_fields=("user_id",))
 
 @app.post("/", response_model=CartItem)
 async def create_cart_item(cart_item: CartItem):
-    cart_item.id = len(carts_db) + 1
-    carts_db.append(cart_item)
-    return cart_item
+    return carts_db.insert(cart_item.dict())
 
 @app.get("/user/{user_id}", response_model=List[CartItem])
 async def get_user_cart(user_id: int):
-    user_cart = [item for item in carts_db if item.user_id == user_id]
-    return user_cart
+    return carts_db.list(user_id=user_id)
 
 @app.put("/{item_id}", response_model=CartItem)
 async def update_cart_item(item_id: int, cart_item: CartItem):
-    if item_id <= 0 or item_id > len(carts_db):
+    updated = carts_db.update(item_id, cart_item.dict())
+    if updated is None:
         raise HTTPException(status_code=404, detail="Cart item not found")
-    cart_item.id = item_id
-    carts_db[item_id - 1] = cart_item
-    return cart_item
+    return updated
 
 @app.delete("/{item_id}")
 async def delete_cart_item(item_id: int):
-    if item_id <= 0 or item_id > len(carts_db):
+    if not carts_db.delete(item_id):
         raise HTTPException(status_code=404, detail="Cart item not found")
-    carts_db.pop(item_id - 1)
     return {"message": "Cart item deleted"}
 
 if __name__ == "__main__":
@@ -0,0 +1,179 @@
+# services/common/storage.py
+"""Pluggable state backends for the service records.
+
+Shared by all services: each Docker image copies this file next to its
+main.py, and local runs put this directory on PYTHONPATH.
+
+The backend is chosen with the ``STATE_BACKEND`` environment variable:
+
+- ``memory`` (default): process-local dict, only safe with a single worker.
+- ``sqlite``: SQLite database in WAL mode at ``STATE_DB_PATH``, shared by every
+  worker/replica that can see the file.
+- ``package.module:ClassName``: any other ``StateBackend`` implementation, e.g.
+  a networked store. The class is constructed with the collection name and
+  the fields that ``list`` filters on (``index_fields``).
+"""
+import importlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence
+
+
+class StateBackend:
+    """Interface for a collection of JSON records keyed by an integer id."""
+
+    def __init__(self, collection: str, index_fields: Sequence[str] = ()):
+        self.collection = collection
+        self.index_fields = tuple(index_fields)
+
+    def insert(self, record: Dict) -> Dict:
+        """Store a new record, assign it an id and return it"""
+        raise NotImplementedError
+
+    def get(self, record_id: int) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def list(self, **filters) -> List[Dict]:
+        """Return all records whose fields equal the given filters"""
+        raise NotImplementedError
+
+    def update(self, record_id: int, record: Dict) -> Optional[Dict]:
+        """Replace an existing record, returns None if it does not exist"""
+        raise NotImplementedError
+
+    def delete(self, record_id: int) -> bool:
+        raise NotImplementedError
+
+
+class MemoryBackend(StateBackend):
+    """Process-local storage, only consistent with a single worker"""
+
+    def __init__(self, collection: str, index_fields: Sequence[str] = ()):
+        super().__init__(collection, index_fields)
+        self._records: Dict[int, Dict] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def insert(self, record: Dict) -> Dict:
+        with self._lock:
+            record = {**record, "id": self._next_id}
+            self._records[self._next_id] = record
+            self._next_id += 1
+        return record
+
+    def get(self, record_id: int) -> Optional[Dict]:
+        return self._records.get(record_id)
+
+    def list(self, **filters) -> List[Dict]:
+        return [
+            record for record in self._records.values()
+            if all(record.get(k) == v for k, v in filters.items())
+        ]
+
+    def update(self, record_id: int, record: Dict) -> Optional[Dict]:
+        with self._lock:
+            if record_id not in self._records:
+                return None
+            record = {**record, "id": record_id}
+            self._records[record_id] = record
+        return record
+
+    def delete(self, record_id: int) -> bool:
+        with self._lock:
+            return self._records.pop(record_id, None) is not None
+
+
+class SQLiteBackend(StateBackend):
+    """SQLite storage in WAL mode, safe to share between workers and replicas on one host"""
+
+    def __init__(self, collection: str, index_fields: Sequence[str] = (), path: Optional[str] = None):
+        super().__init__(collection, index_fields)
+        self.path = path or os.getenv("STATE_DB_PATH", "./state.db")
+        self._local = threading.local()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{collection}" '
+                "(id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL)"
+            )
+            for field in self.index_fields:
+                conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{collection}_{field}_idx" '
+                    f'ON "{collection}" ({self._field_expr(field)})'
+                )
+
+    @staticmethod
+    def _field_expr(field: str) -> str:
+        # Queries must use exactly this expression for SQLite to pick the index
+        return f"json_extract(data, '$.{field}')"
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread and process; workers may be forked after import
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _row_to_record(row) -> Dict:
+        return {**json.loads(row[1]), "id": row[0]}
+
+    def insert(self, record: Dict) -> Dict:
+        data = {k: v for k, v in record.items() if k != "id"}
+        cur = self._conn().execute(
+            f'INSERT INTO "{self.collection}" (data) VALUES (?)', (json.dumps(data),)
+        )
+        return {**data, "id": cur.lastrowid}
+
+    def get(self, record_id: int) -> Optional[Dict]:
+        row = self._conn().execute(
+            f'SELECT id, data FROM "{self.collection}" WHERE id = ?', (record_id,)
+        ).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def list(self, **filters) -> List[Dict]:
+        query = f'SELECT id, data FROM "{self.collection}"'
+        clauses = [f"{self._field_expr(field)} = ?" for field in filters]
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        rows = self._conn().execute(query + " ORDER BY id", tuple(filters.values()))
+        return [self._row_to_record(row) for row in rows]
+
+    def update(self, record_id: int, record: Dict) -> Optional[Dict]:
+        data = {k: v for k, v in record.items() if k != "id"}
+        cur = self._conn().execute(
+            f'UPDATE "{self.collection}" SET data = ? WHERE id = ?',
+            (json.dumps(data), record_id),
+        )
+        return {**data, "id": record_id} if cur.rowcount else None
+
+    def delete(self, record_id: int) -> bool:
+        cur = self._conn().execute(
+            f'DELETE FROM "{self.collection}" WHERE id = ?', (record_id,)
+        )
+        return cur.rowcount > 0
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+def get_backend(collection: str, name: Optional[str] = None, index_fields: Sequence[str] = ()) -> StateBackend:
+    """Create the configured state backend for a collection, indexed on the fields list() filters by"""
+    name = name or os.getenv("STATE_BACKEND", "memory")
+    if name in BACKENDS:
+        return BACKENDS[name](collection, index_fields)
+    # Hook for external stores, e.g. "redis_store:RedisBackend"
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown state backend: {name}")
+    backend_cls = getattr(importlib.import_module(module_name), class_name)
+    return backend_cls(collection, index_fields)
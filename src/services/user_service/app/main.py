@@ -4,45 +4,51 @@ from pydantic import BaseModel
 from typing import Optional, List
 import uvicorn
 
+from storage import get_backend
+
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    from fastapi.responses import JSONResponse as DefaultResponse
+
 # Add prefix to match the nginx routing
-app = FastAPI(root_path="/users")
+app = FastAPI(root_path="/users", default_response_class=DefaultResponse)
 
 class User(BaseModel):
     id: Optional[int] = None
     name: str
     email: str
 
-users_db = []
+# Shared across workers/replicas when STATE_BACKEND is not "memory"
+users_db = get_backend("users")
 
 @app.post("/", response_model=User)
 async def create_user(user: User):
-    user.id = len(users_db) + 1
-    users_db.append(user)
-    return user
+    return users_db.insert(user.dict())
 
 @app.get("/", response_model=List[User])
 async def get_users():
-    return users_db
+    return users_db.list()
 
 @app.get("/{user_id}", response_model=User)
 async def get_user(user_id: int):
-    if user_id <= 0 or user_id > len(users_db):
+    user = users_db.get(user_id)
+    if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return users_db[user_id - 1]
+    return user
 
 @app.put("/{user_id}", response_model=User)
 async def update_user(user_id: int, user: User):
-    if user_id <= 0 or user_id > len(users_db):
+    updated = users_db.update(user_id, user.dict())
+    if updated is None:
         raise HTTPException(status_code=404, detail="User not found")
-    user.id = user_id
-    users_db[user_id - 1] = user
-    return user
+    return updated
 
 @app.delete("/{user_id}")
 async def delete_user(user_id: int):
-    if user_id <= 0 or user_id > len(users_db):
+    if not users_db.delete(user_id):
         raise HTTPException(status_code=404, detail="User not found")
-    users_db.pop(user_id - 1)
     return {"message": "User deleted"}
 
 if __name__ == "__main__":
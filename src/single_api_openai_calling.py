@@ -1,6 +1,7 @@
 import os
 import json
 import jsonref
+import json_backend
 import requests
 from pprint import pp
 from openai import OpenAI
@@ -161,7 +162,7 @@ def process_user_instruction(functions, instruction):
 
         for tool_call in message.tool_calls:
             function_name = tool_call.function.name
-            function_args = json.loads(tool_call.function.arguments)
+            function_args = json_backend.loads(tool_call.function.arguments)
 
             api_response = call_api(function_name, function_args)
 
@@ -170,7 +171,7 @@ def process_user_instruction(functions, instruction):
                     "role": "tool",
                     "name": tool_call.function.name,  
                     "tool_call_id": tool_call.id,  
-                    "content": json.dumps(api_response),  
+                    "content": json_backend.dumps(api_response),  
                 }
             )
 
@@ -4,6 +4,12 @@ from sqlalchemy import create_engine, Column, Integer, String, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
 
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    from fastapi.responses import JSONResponse as DefaultResponse
+
 DATABASE_URL = "sqlite:///./shopping_cart.db"
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -49,7 +55,7 @@ def get_db():
     finally:
         db.close()
 
-app = FastAPI()
+app = FastAPI(default_response_class=DefaultResponse)
 
 # User Endpoints
 @app.post("/users/", response_model=UserCreate)
@@ -0,0 +1,111 @@
+import pytest
+
+from plan_cache import PlanCache, PlanMismatch, normalize_instruction
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PlanCache(str(tmp_path / "plan_cache.json"))
+
+
+def compile_args(cache, args, instruction, previous_calls=()):
+    _, slots = normalize_instruction(instruction)
+    return cache._compile_value(args, None, slots, list(previous_calls))
+
+
+def test_normalize_instruction_extracts_values():
+    template, slots = normalize_instruction('Create user "Alice" with email alice@x.com and add 3 items')
+    assert template == "create user <0> with email <1> and add <2> items"
+    assert slots == ["Alice", "alice@x.com", "3"]
+
+
+def test_compile_binds_instruction_values(cache):
+    args = {"requestBody": {"name": "Alice", "quantity": 3}}
+    compiled = compile_args(cache, args, 'Add 3 for "Alice"')
+    assert compiled == {"requestBody": {
+        "name": {"$slots": [1], "$type": "str"},
+        "quantity": {"$slots": [0], "$type": "int"},
+    }}
+
+
+def test_compile_keeps_every_ambiguous_slot(cache):
+    args = {"requestBody": {"user_id": 1, "quantity": 1}}
+    compiled = compile_args(cache, args, "Add 1 pen to the cart of user 1")
+    assert compiled["requestBody"]["user_id"] == {"$slots": [0, 1], "$type": "int"}
+    assert compiled["requestBody"]["quantity"] == {"$slots": [0, 1], "$type": "int"}
+
+
+def test_bind_rejects_ambiguous_slots_that_differ(cache):
+    compiled = {"user_id": {"$slots": [0, 1], "$type": "int"}}
+    with pytest.raises(PlanMismatch):
+        cache._bind_value(compiled, ["3", "7"], [])
+
+
+def test_bind_accepts_ambiguous_slots_that_agree(cache):
+    compiled = {"user_id": {"$slots": [0, 1], "$type": "int"}}
+    assert cache._bind_value(compiled, ["4", "4"], []) == {"user_id": 4}
+
+
+def test_bind_rejects_value_of_wrong_type(cache):
+    with pytest.raises(PlanMismatch):
+        cache._bind_value({"$slots": [0], "$type": "int"}, ["pen"], [])
+
+
+def test_compile_prefers_response_ref_over_slot(cache):
+    # user_id equals both the created user's id and the quantity in the instruction
+    previous = [("create_user__post", {}, {"id": 1, "name": "Al"})]
+    args = {"requestBody": {"user_id": 1, "quantity": 1}}
+    compiled = compile_args(cache, args, "Add 1 pen", previous)
+    assert compiled["requestBody"]["user_id"] == {"$ref": [0, "id"]}
+    assert compiled["requestBody"]["quantity"] == {"$slots": [0], "$type": "int"}
+
+
+def test_compile_prefers_same_named_response_field(cache):
+    previous = [
+        ("create_user__post", {}, {"id": 1}),
+        ("create_cart_item__post", {}, {"id": 1, "user_id": 1}),
+    ]
+    compiled = compile_args(cache, {"parameters": {"user_id": 1}}, "Show the user", previous)
+    assert compiled == {"parameters": {"user_id": {"$ref": [1, "user_id"]}}}
+
+
+def test_bind_resolves_refs(cache):
+    compiled = {"user_id": {"$ref": [0, "id"]}}
+    assert cache._bind_value(compiled, [], [{"id": 42}]) == {"user_id": 42}
+    with pytest.raises(PlanMismatch):
+        cache._bind_value(compiled, [], [{"name": "no id"}])
+
+
+def test_record_skips_plan_with_unused_slot(cache):
+    user = {"name": "Al", "email": "al@x.com"}
+    calls = [("create_user__post", {"requestBody": user}, {"id": i, **user}) for i in (1, 2)]
+    assert not cache.record("Create 2 users", calls)
+    assert cache.lookup("Create 5 users") is None
+
+
+def test_record_and_replay(cache):
+    calls = [
+        ("create_user__post", {"requestBody": {"name": "Alice"}}, {"id": 1, "name": "Alice"}),
+        ("create_cart_item__post", {"requestBody": {"user_id": 1, "quantity": 2}}, {"id": 1}),
+    ]
+    assert cache.record('Create "Alice" and add 2 items', calls)
+
+    plan, slots = cache.lookup('create "Bob" and add 5 items')
+    ids = iter([7, 8])
+    sent = []
+
+    def execute(function_name, args):
+        sent.append((function_name, args))
+        return {"id": next(ids)}
+
+    cache.run(plan, slots, execute)
+    assert sent == [
+        ("create_user__post", {"requestBody": {"name": "Bob"}}),
+        ("create_cart_item__post", {"requestBody": {"user_id": 7, "quantity": 5}}),
+    ]
+
+
+def test_corrupt_cache_file_starts_empty(tmp_path):
+    path = tmp_path / "plan_cache.json"
+    path.write_text('{"trunc')
+    assert PlanCache(str(path)).plans == {}